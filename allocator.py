@@ -1,14 +1,107 @@
-import math
+import numpy as np
+from numba import njit
+from functools import lru_cache
 from typing import List, Dict, Tuple
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
-@dataclass
+DEFAULT_FEE = 0.003
+DEFAULT_REBATE = 0.002
+ALLOCATION_STEP = 100
+
+@dataclass(slots=True)
 class Venue:
     id: str
     ask: float
     ask_size: int
-    fee: float = 0.003  
-    rebate: float = 0.002  
+    fee: float = DEFAULT_FEE
+    rebate: float = DEFAULT_REBATE
+
+@dataclass(slots=True, frozen=True)
+class VenueBatch:
+    # Struct-of-arrays view of a snapshot's venues, one entry per venue
+    # Frozen over read-only copies of its inputs so state_key can't go stale under an
+    # allocation cache; the caller's arrays are left untouched
+    asks: np.ndarray
+    fees: np.ndarray
+    rebates: np.ndarray
+    ask_sizes: np.ndarray
+    ids: Tuple[str, ...] = field(default=())
+    effective_asks: np.ndarray = field(init=False, repr=False)
+    state_key: Tuple[tuple, tuple] = field(init=False, repr=False)
+    
+    def __post_init__(self):
+        for name in ('asks', 'fees', 'rebates', 'ask_sizes'):
+            arr = np.array(getattr(self, name), copy=True)
+            arr.flags.writeable = False
+            object.__setattr__(self, name, arr)
+        
+        # Per-share taker cost, folded once so hot loops read it instead of adding ask + fee
+        effective_asks = self.asks + self.fees
+        effective_asks.flags.writeable = False
+        object.__setattr__(self, 'effective_asks', effective_asks)
+        # Hashable book state, built once so allocation lookups skip re-tupling the arrays
+        object.__setattr__(self, 'state_key', (tuple(effective_asks.tolist()),
+                                               tuple(self.ask_sizes.tolist())))
+    
+    def __len__(self) -> int:
+        return self.asks.shape[0]
+    
+    @classmethod
+    def from_venues(cls, venues: List[Venue]) -> 'VenueBatch':
+        return cls(
+            asks=np.array([v.ask for v in venues], dtype=np.float64),
+            fees=np.array([v.fee for v in venues], dtype=np.float64),
+            rebates=np.array([v.rebate for v in venues], dtype=np.float64),
+            ask_sizes=np.array([v.ask_size for v in venues], dtype=np.int64),
+            ids=tuple(v.id for v in venues)
+        )
+
+@njit('Tuple((int64[:], float64))(int64, int64, float64[:], int64[:])', cache=True, nogil=True)
+def _allocate_dp(order_size, step, effective_asks, ask_sizes):
+    num_venues = effective_asks.shape[0]
+    num_states = order_size // step + 1
+
+    # dp[k]: cheapest cost of placing k * step shares across the venues seen so far
+    dp = np.full(num_states, np.inf)
+    dp[0] = 0.0
+    choice = np.zeros((num_venues, num_states), dtype=np.int64)
+
+    for v_idx in range(num_venues):
+        unit_cost = step * effective_asks[v_idx]
+        max_lots = min(ask_sizes[v_idx] // step, num_states - 1)
+
+        # Walk states downwards so dp[s] still holds the previous venue's value
+        for s in range(num_states - 1, -1, -1):
+            if dp[s] == np.inf:
+                continue
+            for q in range(1, min(max_lots, num_states - 1 - s) + 1):
+                cost = dp[s] + q * unit_cost
+                if cost < dp[s + q]:
+                    dp[s + q] = cost
+                    choice[v_idx, s + q] = q
+
+    split = np.zeros(num_venues, dtype=np.int64)
+
+    # Only exact fills are accepted, as in the original split enumeration, so the
+    # lambda/theta over- and under-fill penalties are zero at every accepted state
+    terminal = num_states - 1
+    if terminal * step != order_size or dp[terminal] == np.inf:
+        return split, np.inf
+
+    s = terminal
+    for v_idx in range(num_venues - 1, -1, -1):
+        q = choice[v_idx, s]
+        split[v_idx] = q * step
+        s -= q
+
+    return split, dp[terminal]
+
+@lru_cache(maxsize=4096)
+def _allocate_cached(order_size: int, state_key: Tuple[tuple, tuple]) -> Tuple[Tuple[int, ...], float]:
+    effective_asks, ask_sizes = state_key
+    split, cost = _allocate_dp(order_size, ALLOCATION_STEP, np.array(effective_asks, dtype=np.float64),
+                               np.array(ask_sizes, dtype=np.int64))
+    return tuple(split.tolist()), cost
 
 class ContKukanovAllocator:
     #Implements the Cont-Kukanov optimal order allocation algorithm
@@ -21,78 +114,36 @@ class ContKukanovAllocator:
     
     def allocate(self, order_size: int, venues: List[Venue]) -> Tuple[List[int], float]:
 
-        step = 100  
-        splits = [[]] 
-        
-        for v_idx in range(len(venues)):
-            new_splits = []
-            for alloc in splits:
-                used = sum(alloc)
-                max_v = min(order_size - used, venues[v_idx].ask_size)
-                
-                for q in range(0, max_v + 1, step):
-                    new_splits.append(alloc + [q])
-            
-            splits = new_splits
-        
-        best_cost = float('inf')
-        best_split = []
-        
-        for alloc in splits:
-            if sum(alloc) != order_size:
-                continue
-                
-            cost = self._compute_cost(alloc, venues, order_size)
-            if cost < best_cost:
-                best_cost = cost
-                best_split = alloc
-        
-        return best_split, best_cost
+        split, cost = self.allocate_batch(order_size, VenueBatch.from_venues(venues))
+        if cost == np.inf:
+            return [], float('inf')
+
+        return list(split), cost
     
-    def _compute_cost(self, split: List[int], venues: List[Venue], order_size: int) -> float:
+    def allocate_batch(self, order_size: int, batch: VenueBatch) -> Tuple[Tuple[int, ...], float]:
+        # Array form of allocate for callers that already hold a VenueBatch
+        # The DP only reads the book, so results are cached per (order size, book state)
 
-        executed = 0
-        cash_spent = 0
-        
-        for i, venue in enumerate(venues):
-            exe = min(split[i], venue.ask_size)
-            executed += exe
-            cash_spent += exe * (venue.ask + venue.fee)
-            
-            maker_rebate = max(split[i] - exe, 0) * venue.rebate
-            cash_spent -= maker_rebate
-        
-        underfill = max(order_size - executed, 0)
-        overfill = max(executed - order_size, 0)
-        
-        risk_penalty = self.theta_queue * (underfill + overfill)
-        cost_penalty = self.lambda_under * underfill + self.lambda_over * overfill
-        
-        return cash_spent + risk_penalty + cost_penalty
+        return _allocate_cached(order_size, batch.state_key)
     
     def update_parameters(self, lambda_over: float, lambda_under: float, theta_queue: float):
         self.lambda_over = lambda_over
         self.lambda_under = lambda_under
         self.theta_queue = theta_queue
 
-def create_venues_from_snapshot(snapshot_data: Dict) -> List[Venue]:
+def create_venues_from_snapshot(snapshot_data: Dict) -> VenueBatch:
 
-    venues = []
-    
     venue_data = {}
     for record in snapshot_data:
         venue_id = str(record['publisher_id'])
         if venue_id not in venue_data:
-            venue_data[venue_id] = {
-                'ask': record['ask_px_00'],
-                'ask_size': record['ask_sz_00']
-            }
-    
-    for venue_id, data in venue_data.items():
-        venues.append(Venue(
-            id=venue_id,
-            ask=data['ask'],
-            ask_size=data['ask_size']
-        ))
+            venue_data[venue_id] = (record['ask_px_00'], record['ask_sz_00'])
     
-    return venues
\ No newline at end of file
+    num_venues = len(venue_data)
+    return VenueBatch(
+        asks=np.array([ask for ask, _ in venue_data.values()], dtype=np.float64),
+        fees=np.full(num_venues, DEFAULT_FEE, dtype=np.float64),
+        rebates=np.full(num_venues, DEFAULT_REBATE, dtype=np.float64),
+        ask_sizes=np.array([size for _, size in venue_data.values()], dtype=np.int64),
+        ids=tuple(venue_data.keys())
+    )
\ No newline at end of file
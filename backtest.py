@@ -1,35 +1,78 @@
 import json
+import os
 import time
+from itertools import product
 from typing import Dict, List, Tuple
 from kafka import KafkaConsumer
 from concurrent.futures import ThreadPoolExecutor
 import threading
 from dataclasses import asdict
+import numpy as np
+import orjson
 
 from config.kafka_config import KAFKA_CONFIG
-from allocator import ContKukanovAllocator, Venue, create_venues_from_snapshot
+from allocator import (ContKukanovAllocator, VenueBatch, create_venues_from_snapshot,
+                       DEFAULT_FEE, DEFAULT_REBATE)
 from benchmark_strategies import BenchmarkStrategies, ExecutionResult
 
 class SORBacktester:
     #Smart Order Router Backtesting Engine
 
     
-    def __init__(self):
+    def __init__(self, warmup_target: int = 500):
         self.consumer = KafkaConsumer(
             KAFKA_CONFIG['topic_name'],
             bootstrap_servers=KAFKA_CONFIG['bootstrap_servers'],
             auto_offset_reset='earliest',
             enable_auto_commit=True,
             group_id='sor_backtest_group',
-            value_deserializer=lambda m: json.loads(m.decode('utf-8'))
+            value_deserializer=orjson.loads
         )
         
         self.target_shares = 5000
+        self.max_workers = min(8, os.cpu_count() or 1)
         self.snapshots_received = []
+        self.snapshot_lock = threading.Lock()
+        self.warmup_event = threading.Event()
+        self.warmup_target = warmup_target  # Snapshots to collect before the sweep starts
+        self.prepared = []
+        self.snapshot_to_unique = []
         self.running = False
         
         self.benchmarks = BenchmarkStrategies()
         
+    def _prepare_snapshots(self):
+        # Turn the consumed snapshots into per-book arrays and release the raw JSON
+        # Identical books share one VenueBatch; snapshot_to_unique replays the stream order
+
+        with self.snapshot_lock:
+            raw_snapshots, self.snapshots_received = self.snapshots_received, []
+        
+        prepared = []
+        unique_snapshots = {}
+        snapshot_to_unique = []
+        for snapshot in raw_snapshots:
+            valid = [v for v in snapshot['venues'] if v['ask_px_00'] > 0 and v['ask_sz_00'] > 0]
+            if not valid:
+                continue
+            
+            asks = np.array([v['ask_px_00'] for v in valid], dtype=np.float64)
+            ask_sizes = np.array([v['ask_sz_00'] for v in valid], dtype=np.int64)
+            
+            key = asks.tobytes() + ask_sizes.tobytes()
+            if key not in unique_snapshots:
+                unique_snapshots[key] = len(prepared)
+                prepared.append(VenueBatch(
+                    asks=asks,
+                    fees=np.full(len(valid), DEFAULT_FEE, dtype=np.float64),
+                    rebates=np.full(len(valid), DEFAULT_REBATE, dtype=np.float64),
+                    ask_sizes=ask_sizes
+                ))
+            snapshot_to_unique.append(unique_snapshots[key])
+        
+        self.prepared = prepared
+        self.snapshot_to_unique = snapshot_to_unique
+    
     def parameter_search(self) -> Tuple[Dict, float]:
 
  
@@ -43,37 +86,41 @@ class SORBacktester:
         best_cost = float('inf')
         best_result = None
         
-        total_combinations = len(lambda_over_values) * len(lambda_under_values) * len(theta_queue_values)
-        current_combination = 0
-        
-        for lambda_over in lambda_over_values:
-            for lambda_under in lambda_under_values:
-                for theta_queue in theta_queue_values:
-                    current_combination += 1
-                    
-                    allocator = ContKukanovAllocator(lambda_over, lambda_under, theta_queue)
-                    result = self._test_strategy(allocator)
-                    
-                    if result and result.total_cash < best_cost:
-                        best_cost = result.total_cash
-                        best_params = {
-                            'lambda_over': lambda_over,
-                            'lambda_under': lambda_under,
-                            'theta_queue': theta_queue
-                        }
-                        best_result = result
-                    
-                    if current_combination % 10 == 0:
-                        print(f"Tested {current_combination}/{total_combinations} combinations...")
+        combinations = list(product(lambda_over_values, lambda_under_values, theta_queue_values))
+        total_combinations = len(combinations)
+        
+        # Each combination is independent; the jitted DP releases the GIL so threads overlap
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = executor.map(self._eval_combo, combinations)
+            
+            for current_combination, (params, result) in enumerate(zip(combinations, results), 1):
+                lambda_over, lambda_under, theta_queue = params
+                
+                if result and result.total_cash < best_cost:
+                    best_cost = result.total_cash
+                    best_params = {
+                        'lambda_over': lambda_over,
+                        'lambda_under': lambda_under,
+                        'theta_queue': theta_queue
+                    }
+                    best_result = result
+                
+                if current_combination % 10 == 0:
+                    print(f"Tested {current_combination}/{total_combinations} combinations...")
         
         print(f"Parameter search complete. Best cost: ${best_cost:.2f}")
         return best_params, best_result
     
+    def _eval_combo(self, params: Tuple[float, float, float]) -> ExecutionResult:
+        lambda_over, lambda_under, theta_queue = params
+        allocator = ContKukanovAllocator(lambda_over, lambda_under, theta_queue)
+        return self._test_strategy(allocator)
+    
     def _test_strategy(self, allocator: ContKukanovAllocator) -> ExecutionResult:
 
         
    
-        if not self.snapshots_received:
+        if not self.prepared:
             return None
         
         total_cash = 0.0
@@ -82,32 +129,23 @@ class SORBacktester:
         
         remaining_shares = self.target_shares
         
-        for snapshot in self.snapshots_received:
+        for unique_idx in self.snapshot_to_unique:
             if remaining_shares <= 0:
                 break
             
-            venues = []
-            for venue_data in snapshot['venues']:
-                if venue_data['ask_px_00'] > 0 and venue_data['ask_sz_00'] > 0:
-                    venues.append(Venue(
-                        id=str(venue_data['publisher_id']),
-                        ask=venue_data['ask_px_00'],
-                        ask_size=venue_data['ask_sz_00']
-                    ))
-            
-            if not venues:
-                continue
+            batch = self.prepared[unique_idx]
+            order_size = min(remaining_shares, self.target_shares)
             
             try:
-                allocation, expected_cost = allocator.allocate(
-                    min(remaining_shares, self.target_shares), venues
-                )
+                allocation, expected_cost = allocator.allocate_batch(order_size, batch)
+                if expected_cost == np.inf:
+                    continue
                 
-                for i, venue in enumerate(venues):
-                    if i < len(allocation) and allocation[i] > 0:
-                        shares_to_buy = min(allocation[i], venue.ask_size, remaining_shares)
+                for i, quantity in enumerate(allocation):
+                    if quantity > 0:
+                        shares_to_buy = min(quantity, int(batch.ask_sizes[i]), remaining_shares)
                         if shares_to_buy > 0:
-                            cost = shares_to_buy * (venue.ask + venue.fee)
+                            cost = shares_to_buy * batch.effective_asks[i]
                             total_cash += cost
                             shares_filled += shares_to_buy
                             remaining_shares -= shares_to_buy
@@ -126,43 +164,31 @@ class SORBacktester:
         
         results = {}
         
-        if not self.snapshots_received:
+        if not self.snapshot_to_unique:
             print("No snapshots available for benchmarking")
             return results
         
-        first_snapshot = self.snapshots_received[0]
-        venues = []
-        
-        for venue_data in first_snapshot['venues']:
-            if venue_data['ask_px_00'] > 0 and venue_data['ask_sz_00'] > 0:
-                venues.append(Venue(
-                    id=str(venue_data['publisher_id']),
-                    ask=venue_data['ask_px_00'],
-                    ask_size=venue_data['ask_sz_00']
-                ))
-        
-        if not venues:
-            print("No valid venues found for benchmarking")
-            return results
+        first_batch = self.prepared[self.snapshot_to_unique[0]]
+        book = (first_batch.asks, first_batch.effective_asks, first_batch.ask_sizes)
         
         # Run each benchmark
         try:
             # Best Ask
-            result = self.benchmarks.naive_best_ask(self.target_shares, venues.copy())
+            result = self.benchmarks.naive_best_ask(self.target_shares, *book)
             results['best_ask'] = {
                 'total_cash': result.total_cash,
                 'avg_fill_px': result.avg_fill_px
             }
             
             # TWAP
-            result = self.benchmarks.twap_strategy(self.target_shares, venues.copy())
+            result = self.benchmarks.twap_strategy(self.target_shares, *book)
             results['twap'] = {
                 'total_cash': result.total_cash,
                 'avg_fill_px': result.avg_fill_px
             }
             
             # VWAP
-            result = self.benchmarks.vwap_strategy(self.target_shares, venues.copy())
+            result = self.benchmarks.vwap_strategy(self.target_shares, *book)
             results['vwap'] = {
                 'total_cash': result.total_cash,
                 'avg_fill_px': result.avg_fill_px
@@ -191,10 +217,15 @@ class SORBacktester:
                     break
                 
                 snapshot = message.value
-                self.snapshots_received.append(snapshot)
+                with self.snapshot_lock:
+                    self.snapshots_received.append(snapshot)
+                    snapshot_count = len(self.snapshots_received)
                 
-                if len(self.snapshots_received) % 50 == 0:
-                    print(f"Received {len(self.snapshots_received)} snapshots")
+                if snapshot_count >= self.warmup_target:
+                    self.warmup_event.set()
+                
+                if snapshot_count % 50 == 0:
+                    print(f"Received {snapshot_count} snapshots")
                 
         except KeyboardInterrupt:
             print("Data consumption interrupted by user")
@@ -202,6 +233,7 @@ class SORBacktester:
             print(f"Error consuming data: {e}")
         finally:
             self.running = False
+            self.warmup_event.set()  # Nothing more is coming, don't keep run_backtest waiting
             self.consumer.close()
     
     def run_backtest(self) -> Dict:
@@ -216,7 +248,8 @@ class SORBacktester:
         )
         consumer_thread.start()
         
-        time.sleep(10)
+        # Start once warmup_target snapshots have arrived, waiting at most 10 seconds
+        self.warmup_event.wait(timeout=10)
         
         if not self.snapshots_received:
             print("No data received, cannot proceed with backtest")
@@ -224,6 +257,10 @@ class SORBacktester:
         
         print(f"Received {len(self.snapshots_received)} market snapshots")
         
+        # The sweep scores one fixed set of snapshots, so stop consuming before packing them
+        self.running = False
+        self._prepare_snapshots()
+        
         best_params, optimized_result = self.parameter_search()
         
         benchmark_results = self.run_benchmarks()
@@ -1,7 +1,9 @@
 from typing import List, Dict, Tuple
 from dataclasses import dataclass
+import heapq
 import time
-from allocator import Venue
+import numpy as np
+from allocator import Venue, VenueBatch
 
 @dataclass
 class ExecutionResult:
@@ -10,14 +12,23 @@ class ExecutionResult:
     avg_fill_px: float
     execution_time: float
 
+def _ask_heap(asks: np.ndarray, ask_sizes: np.ndarray) -> List[Tuple[float, int]]:
+    # Min-heap of venue indices keyed on ask; the index keeps ties in array order like min()
+    heap = [(ask, idx) for idx, (ask, size) in enumerate(zip(asks.tolist(), ask_sizes.tolist()))
+            if size > 0]
+    heapq.heapify(heap)
+    return heap
+
 class BenchmarkStrategies:
     #Implementation of benchmark strategies for comparison
+    #Strategies take per-venue arrays (ask, ask + fee, size) and never modify the caller's ask sizes
     
     
     def __init__(self):
         pass
     
-    def naive_best_ask(self, target_shares: int, venues: List[Venue]) -> ExecutionResult:
+    def naive_best_ask(self, target_shares: int, asks: np.ndarray, effective_asks: np.ndarray,
+                       ask_sizes: np.ndarray) -> ExecutionResult:
       
         start_time = time.time()
         
@@ -26,30 +37,31 @@ class BenchmarkStrategies:
         
         remaining_shares = target_shares
         
-        while remaining_shares > 0 and venues:
-            best_venue = min(venues, key=lambda v: v.ask)
+        sizes = ask_sizes.copy()
+        heap = _ask_heap(asks, sizes)
+        
+        while remaining_shares > 0 and heap:
+            entry = heapq.heappop(heap)
+            idx = entry[1]
             
-            shares_to_buy = min(remaining_shares, best_venue.ask_size)
+            shares_to_buy = min(remaining_shares, int(sizes[idx]))
             
-            if shares_to_buy > 0:
-                cost = shares_to_buy * (best_venue.ask + best_venue.fee)
-                total_cash += cost
-                shares_filled += shares_to_buy
-                remaining_shares -= shares_to_buy
-                
-                best_venue.ask_size -= shares_to_buy
-                if best_venue.ask_size <= 0:
-                    venues.remove(best_venue)
-            else:
-                break
+            cost = shares_to_buy * effective_asks[idx]
+            total_cash += cost
+            shares_filled += shares_to_buy
+            remaining_shares -= shares_to_buy
+            
+            sizes[idx] -= shares_to_buy
+            if sizes[idx] > 0:
+                heapq.heappush(heap, entry)
         
         avg_fill_px = total_cash / shares_filled if shares_filled > 0 else 0.0
         execution_time = time.time() - start_time
         
         return ExecutionResult(total_cash, shares_filled, avg_fill_px, execution_time)
     
-    def twap_strategy(self, target_shares: int, venues: List[Venue], 
-                     duration_seconds: int = 60) -> ExecutionResult:
+    def twap_strategy(self, target_shares: int, asks: np.ndarray, effective_asks: np.ndarray,
+                      ask_sizes: np.ndarray, duration_seconds: int = 60) -> ExecutionResult:
 
         # TWAP: Time-Weighted Average Price over specified duration
 
@@ -62,69 +74,64 @@ class BenchmarkStrategies:
         total_cash = 0.0
         shares_filled = 0
         
+        sizes = ask_sizes.copy()
+        heap = _ask_heap(asks, sizes)
+        
         for interval in range(num_intervals):
-            if not venues:
-                break
-                
             shares_to_buy = shares_per_interval
             if interval == num_intervals - 1:  # Last interval gets remainder
                 shares_to_buy = target_shares - shares_filled
             
-            available_venues = [v for v in venues if v.ask_size > 0]
-            if available_venues:
-                best_venue = min(available_venues, key=lambda v: v.ask)
-                executable_shares = min(shares_to_buy, best_venue.ask_size)
+            if heap:
+                idx = heap[0][1]
+                executable_shares = min(shares_to_buy, int(sizes[idx]))
                 
                 if executable_shares > 0:
-                    cost = executable_shares * (best_venue.ask + best_venue.fee)
+                    cost = executable_shares * effective_asks[idx]
                     total_cash += cost
                     shares_filled += executable_shares
-                    best_venue.ask_size -= executable_shares
-            
-            time.sleep(0.01)  # Small delay to simulate time passage
+                    sizes[idx] -= executable_shares
+                    if sizes[idx] <= 0:
+                        heapq.heappop(heap)
         
         avg_fill_px = total_cash / shares_filled if shares_filled > 0 else 0.0
         execution_time = time.time() - start_time
         
         return ExecutionResult(total_cash, shares_filled, avg_fill_px, execution_time)
     
-    def vwap_strategy(self, target_shares: int, venues: List[Venue]) -> ExecutionResult:
+    def vwap_strategy(self, target_shares: int, asks: np.ndarray, effective_asks: np.ndarray,
+                      ask_sizes: np.ndarray) -> ExecutionResult:
         # VWAP: Volume-Weighted Average Price
 
         start_time = time.time()
         
-        total_volume = sum(venue.ask_size for venue in venues)
+        total_volume = int(ask_sizes.sum())
         
         if total_volume == 0:
             return ExecutionResult(0.0, 0, 0.0, time.time() - start_time)
         
-        total_cash = 0.0
-        shares_filled = 0
+        volume_proportion = ask_sizes / total_volume
+        shares = np.minimum((target_shares * volume_proportion).astype(np.int64), ask_sizes)
+        shares = np.maximum(shares, 0)
         
-        for venue in venues:
-            if venue.ask_size > 0:
-                volume_proportion = venue.ask_size / total_volume
-                shares_to_buy = min(
-                    int(target_shares * volume_proportion),
-                    venue.ask_size
-                )
-                
-                if shares_to_buy > 0:
-                    cost = shares_to_buy * (venue.ask + venue.fee)
-                    total_cash += cost
-                    shares_filled += shares_to_buy
+        total_cash = float((shares * effective_asks).sum())
+        shares_filled = int(shares.sum())
         
+        # Top up from the cheapest venues that still have displayed size left
         remaining_shares = target_shares - shares_filled
         if remaining_shares > 0:
-            available_venues = [v for v in venues if v.ask_size > shares_filled]
-            if available_venues:
-                best_venue = min(available_venues, key=lambda v: v.ask)
-                executable_shares = min(remaining_shares, best_venue.ask_size)
+            leftover = ask_sizes - shares
+            for idx in np.argsort(asks, kind='stable'):
+                if remaining_shares <= 0:
+                    break
+                if leftover[idx] <= 0:
+                    continue
                 
-                if executable_shares > 0:
-                    cost = executable_shares * (best_venue.ask + best_venue.fee)
-                    total_cash += cost
-                    shares_filled += executable_shares
+                executable_shares = min(remaining_shares, int(leftover[idx]))
+                cost = executable_shares * effective_asks[idx]
+                total_cash += cost
+                shares_filled += executable_shares
+                remaining_shares -= executable_shares
         
         avg_fill_px = total_cash / shares_filled if shares_filled > 0 else 0.0
         execution_time = time.time() - start_time
@@ -149,11 +156,11 @@ class BenchmarkStrategies:
 
 def test_benchmarks():
     # Create test venues
-    test_venues = [
+    test_venues = VenueBatch.from_venues([
         Venue(id="1", ask=50.00, ask_size=1000, fee=0.003, rebate=0.002),
         Venue(id="2", ask=50.01, ask_size=800, fee=0.003, rebate=0.002),
         Venue(id="3", ask=49.99, ask_size=1200, fee=0.003, rebate=0.002),
-    ]
+    ])
     
     benchmarks = BenchmarkStrategies()
     target_shares = 2000
@@ -162,15 +169,15 @@ def test_benchmarks():
     print("Testing Benchmark Strategies:")
     
     # Best Ask
-    result = benchmarks.naive_best_ask(target_shares, test_venues.copy())
+    result = benchmarks.naive_best_ask(target_shares, test_venues.asks, test_venues.effective_asks, test_venues.ask_sizes)
     print(f"Best Ask: ${result.total_cash:.2f}, {result.shares_filled} shares, avg ${result.avg_fill_px:.4f}")
     
     # TWAP
-    result = benchmarks.twap_strategy(target_shares, test_venues.copy())
+    result = benchmarks.twap_strategy(target_shares, test_venues.asks, test_venues.effective_asks, test_venues.ask_sizes)
     print(f"TWAP: ${result.total_cash:.2f}, {result.shares_filled} shares, avg ${result.avg_fill_px:.4f}")
     
     # VWAP
-    result = benchmarks.vwap_strategy(target_shares, test_venues.copy())
+    result = benchmarks.vwap_strategy(target_shares, test_venues.asks, test_venues.effective_asks, test_venues.ask_sizes)
     print(f"VWAP: ${result.total_cash:.2f}, {result.shares_filled} shares, avg ${result.avg_fill_px:.4f}")
 
 if __name__ == "__main__":
@@ -87,6 +87,14 @@ def test_allocator():
         
         allocation, cost = allocator.allocate(2000, venues)
         
+        assert allocation == [800, 0, 1200], f"unexpected allocation {allocation}"
+        assert abs(cost - 99994.00) < 1e-6, f"unexpected cost {cost}"
+        
+        # 3000 shares displayed in total, so 5000 has no exact fill
+        short_allocation, short_cost = allocator.allocate(5000, venues)
+        assert short_allocation == [] and short_cost == float('inf'), \
+            f"under-liquid book should not allocate, got {short_allocation}, {short_cost}"
+        
         print(f"✓ Allocator test passed")
         print(f"  Allocation: {allocation}")
         print(f"  Expected cost: ${cost:.2f}")
@@ -102,27 +110,41 @@ def test_benchmarks():
     
     try:
         from benchmark_strategies import BenchmarkStrategies
-        from allocator import Venue
+        from allocator import Venue, VenueBatch
         
         benchmarks = BenchmarkStrategies()
         
-        venues = [
+        venues = VenueBatch.from_venues([
             Venue(id="1", ask=50.00, ask_size=1000),
             Venue(id="2", ask=50.01, ask_size=800),
             Venue(id="3", ask=49.99, ask_size=1200),
-        ]
+        ])
+        book = (venues.asks, venues.effective_asks, venues.ask_sizes)
         
         target_shares = 1500
         
-        result = benchmarks.naive_best_ask(target_shares, venues.copy())
+        result = benchmarks.naive_best_ask(target_shares, *book)
+        assert result.shares_filled == target_shares, f"Best Ask filled {result.shares_filled}"
         print(f"✓ Best Ask: {result.shares_filled} shares, ${result.avg_fill_px:.4f} avg price")
         
-        result = benchmarks.vwap_strategy(target_shares, venues.copy())
+        # Best Ask must not have depleted the book the later strategies see
+        result = benchmarks.vwap_strategy(target_shares, *book)
+        assert result.shares_filled == target_shares, f"VWAP filled {result.shares_filled}"
         print(f"✓ VWAP: {result.shares_filled} shares, ${result.avg_fill_px:.4f} avg price")
         
-        result = benchmarks.twap_strategy(target_shares, venues.copy())
+        result = benchmarks.twap_strategy(target_shares, *book)
+        assert result.shares_filled == target_shares, f"TWAP filled {result.shares_filled}"
         print(f"✓ TWAP: {result.shares_filled} shares, ${result.avg_fill_px:.4f} avg price")
         
+        assert venues.ask_sizes.tolist() == [1000, 800, 1200], "benchmarks modified the book"
+        
+        # Asking for more than is displayed, VWAP takes every venue's size and no more
+        displayed = int(venues.ask_sizes.sum())
+        result = benchmarks.vwap_strategy(displayed + 500, *book)
+        assert result.shares_filled == displayed, f"VWAP filled {result.shares_filled} of {displayed} displayed"
+        expected_cash = float((venues.ask_sizes * venues.effective_asks).sum())
+        assert abs(result.total_cash - expected_cash) < 1e-6, f"VWAP paid {result.total_cash}"
+        
         return True
         
     except Exception as e: